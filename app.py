@@ -1,16 +1,23 @@
 """
-Main Flask application for the chatbot.
+Main Quart (ASGI) application for the chatbot.
 """
-from flask import Flask, render_template, request, jsonify, session, Response, send_from_directory
+from quart import Quart, render_template, request, jsonify, session, Response, send_from_directory, stream_with_context
+from quart.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 from werkzeug.utils import secure_filename
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.parser import ParseFailedException
+from streaming_form_data.targets import FileTarget
 from config import Config
-from modules import ChatHandler, MessageStore
-from modules.file_parser import get_file_summary, extract_text_from_file
+from modules import ChatHandler, MessageStore, SessionStore
+from modules.message_store import MAX_SYSTEM_MESSAGE_TOKENS, CHARS_PER_TOKEN
+import asyncio
+import hashlib
 import logging
 import uuid
-import json
 import os
-import time
+import orjson
+from functools import lru_cache
 
 # Configure logging
 logging.basicConfig(
@@ -19,14 +26,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Flask app
-app = Flask(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes and decodes with orjson."""
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# Initialize Quart app
+app = Quart(__name__)
 app.config.from_object(Config)
+app.json = OrjsonProvider(app)
 
 # Configure file uploads
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'csv', 'json', 'md', 'docx', 'xlsx', 'pptx', 'html', 'xml', 'js', 'py', 'java', 'c', 'cpp', 'h', 'css', 'zip', 'tar', 'gz', "yml", "yaml"}
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB limit
+FILE_CONTEXT_CHARS = MAX_SYSTEM_MESSAGE_TOKENS * CHARS_PER_TOKEN  # Most file characters the conversation keeps; bounds extraction reads
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
@@ -50,8 +73,49 @@ chat_handler = ChatHandler(
     provider=Config.AI_PROVIDER
 )
 
+# Health check response, built once at startup since it only depends on configuration
+available_providers = []
+if Config.OPENAI_API_KEY:
+    available_providers.append(f"openai ({Config.OPENAI_MODEL})")
+if Config.GROQ_API_KEY:
+    available_providers.append(f"groq ({Config.GROQ_MODEL})")
+
+_HEALTH_BODY = orjson.dumps({
+    'status': 'healthy',
+    'providers': available_providers,
+    'preference': Config.AI_PROVIDER
+})
+
 # Store for conversation sessions
-conversation_sessions = {}
+session_store = SessionStore(
+    redis_url=Config.REDIS_URL,
+    ttl=Config.SESSION_TTL,
+    cache_size=Config.SESSION_CACHE_SIZE
+)
+
+# Queue for background text extraction (requires Redis and an `rq worker extract` process)
+extract_queue = None
+if Config.REDIS_URL:
+    from redis import Redis
+    from rq import Queue
+    extract_queue = Queue('extract', connection=Redis.from_url(Config.REDIS_URL))
+
+# Static framing for server-sent events; only the variable values are JSON-encoded
+_START_FRAME = b'data: {"type":"start"}\n\n'
+_CHUNK_PREFIX = b'data: {"type":"chunk","content":'
+_CHUNK_SUFFIX = b'}\n\n'
+_END_FMT = b'data: {"type":"end","provider":%b,"model":%b}\n\n'
+
+# Streamed text is sent once it has waited this many seconds or reached this many characters
+SSE_FLUSH_INTERVAL = 0.015
+SSE_FLUSH_SIZE = 512
+
+
+# Prefix of the follow-up message older clients send after an upload
+_FILE_PREFIX = "I've uploaded a file named"
+
+# secure_filename is pure, so repeated names can skip the normalisation work
+cached_secure_filename = lru_cache(maxsize=4096)(secure_filename)
 
 
 def allowed_file(filename):
@@ -59,29 +123,43 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def get_or_create_session():
+async def get_or_create_session():
     """Get or create a conversation session."""
     if 'session_id' not in session:
         session['session_id'] = str(uuid.uuid4())
     
-    session_id = session['session_id']
-    
-    if session_id not in conversation_sessions:
-        message_store = MessageStore(max_history=Config.MAX_CONVERSATION_HISTORY)
-        message_store.set_system_message(Config.SYSTEM_MESSAGE)
-        conversation_sessions[session_id] = message_store
-    
-    return conversation_sessions[session_id]
+    return await session_store.get_or_create(session['session_id'], new_message_store)
+
+
+def new_message_store():
+    """Create the message store for a new conversation."""
+    message_store = MessageStore(
+        max_history=Config.MAX_CONVERSATION_HISTORY,
+        max_tokens=Config.MAX_CONTEXT_TOKENS
+    )
+    message_store.set_system_message(Config.SYSTEM_MESSAGE)
+    return message_store
+
+
+async def save_session(message_store):
+    """Persist the current conversation session after it has been modified."""
+    await session_store.save(session['session_id'], message_store)
+
+
+@app.after_serving
+async def close_clients():
+    """Release pooled provider connections on shutdown."""
+    await chat_handler.aclose()
 
 
 @app.route('/')
-def index():
+async def index():
     """Render the main chat interface."""
-    return render_template('index.html')
+    return await render_template('index.html')
 
 
 @app.route('/api/chat', methods=['POST'])
-def chat():
+async def chat():
     """
     Handle chat messages.
     
@@ -89,11 +167,12 @@ def chat():
     {
         "message": "user message text",
         "temperature": 0.7  (optional),
-        "stream": false  (optional, default: false)
+        "stream": false  (optional, default: false),
+        "is_file_message": false  (optional, default: false)
     }
     """
     try:
-        data = request.get_json()
+        data = await request.get_json()
         
         if not data or 'message' not in data:
             return jsonify({
@@ -112,10 +191,11 @@ def chat():
             }), 400
         
         # Get or create conversation session
-        message_store = get_or_create_session()
+        message_store = await get_or_create_session()
         
-        # Check if this is a message about an uploaded file
-        is_file_message = user_message.startswith("I've uploaded a file named")
+        # Check if this is a message about an uploaded file; older clients
+        # only signal this through the message prefix
+        is_file_message = data.get('is_file_message', False) or user_message.startswith(_FILE_PREFIX)
         
         # If it's not a file message, add it to history
         if not is_file_message:
@@ -133,18 +213,19 @@ def chat():
                            "For text files, you can discuss the content. For images, you can describe what you see. " +
                            "For other files, you can discuss the file type and potential uses."
             }
-            messages.append(file_context)
+            messages = (*messages, file_context)
         
         # If streaming is requested, use the streaming endpoint
         if stream:
             return stream_chat_response(messages, temperature, message_store)
         
         # Otherwise, use the regular response
-        response = chat_handler.get_response(messages, temperature)
+        response = await chat_handler.get_response(messages, temperature)
         
         if response['success']:
             # Add assistant response to history
             message_store.add_message("assistant", response['message'])
+            await save_session(message_store)
             
             return jsonify({
                 'success': True,
@@ -154,6 +235,7 @@ def chat():
                 'usage': response.get('usage', {})
             })
         else:
+            await save_session(message_store)
             return jsonify({
                 'success': False,
                 'error': response.get('error', 'Unknown error'),
@@ -169,37 +251,80 @@ def chat():
         }), 500
 
 
+async def coalesce_chunks(chunks, max_delay=SSE_FLUSH_INTERVAL, max_size=SSE_FLUSH_SIZE):
+    """
+    Merge text chunks that arrive close together so each event carries several tokens.
+    
+    Buffered text is flushed when it reaches max_size characters or has been held
+    for max_delay seconds, even if the upstream stream is quiet at that moment.
+    
+    Args:
+        chunks: Async iterable of text chunks
+        max_delay: Longest time in seconds a chunk is held back
+        max_size: Buffered length in characters that triggers an immediate flush
+    
+    Yields:
+        Combined text chunks
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    buffer = []
+    size = 0
+    deadline = None
+    next_chunk = asyncio.ensure_future(iterator.__anext__())
+    
+    try:
+        while True:
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            done, _ = await asyncio.wait((next_chunk,), timeout=timeout)
+            
+            if done:
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+                
+                if deadline is None:
+                    deadline = loop.time() + max_delay
+                buffer.append(chunk)
+                size += len(chunk)
+            
+            if size >= max_size or (deadline is not None and loop.time() >= deadline):
+                yield "".join(buffer)
+                buffer = []
+                size = 0
+                deadline = None
+        
+        if buffer:
+            yield "".join(buffer)
+    
+    finally:
+        next_chunk.cancel()
+
+
 def stream_chat_response(messages, temperature, message_store):
     """Stream the chat response using server-sent events."""
-    def generate():
-        full_response = ""
-        provider = "unknown"
-        model = "unknown"
+    @stream_with_context
+    async def generate():
+        response_parts = []
+        # Filled in by the handler for this stream only
+        stream_info = {"provider": "unknown", "model": "unknown"}
         
         try:
             # Start with a message indicating the stream is starting
-            yield f"data: {json.dumps({'type': 'start'})}\n\n"
+            yield _START_FRAME
             
             # Stream the response
-            for chunk in chat_handler.stream_response(messages, temperature):
-                full_response += chunk
-                data = {
-                    'type': 'chunk',
-                    'content': chunk
-                }
-                yield f"data: {json.dumps(data)}\n\n"
-            
-            # Get provider and model info
-            if hasattr(chat_handler, 'current_provider'):
-                provider = chat_handler.current_provider
-            if hasattr(chat_handler, 'current_model'):
-                model = chat_handler.current_model
+            async for chunk in coalesce_chunks(chat_handler.stream_response(messages, temperature, stream_info)):
+                response_parts.append(chunk)
+                yield _CHUNK_PREFIX + orjson.dumps(chunk) + _CHUNK_SUFFIX
             
             # Add the complete response to the message store
-            message_store.add_message("assistant", full_response)
+            message_store.add_message("assistant", "".join(response_parts))
             
             # Send a completion message
-            yield f"data: {json.dumps({'type': 'end', 'provider': provider, 'model': model})}\n\n"
+            yield _END_FMT % (orjson.dumps(stream_info["provider"]), orjson.dumps(stream_info["model"]))
         
         except Exception as e:
             logger.error(f"Error in streaming response: {str(e)}")
@@ -207,17 +332,27 @@ def stream_chat_response(messages, temperature, message_store):
                 'type': 'error',
                 'error': str(e)
             }
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield b'data: ' + orjson.dumps(error_data) + b'\n\n'
+        
+        finally:
+            await save_session(message_store)
     
-    return Response(generate(), mimetype='text/event-stream')
+    response = Response(generate(), mimetype='text/event-stream')
+    # LLM streams can outlive Quart's default response timeout
+    response.timeout = None
+    # Keep caches and buffering proxies (nginx) from holding back events
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @app.route('/api/clear', methods=['POST'])
-def clear_conversation():
+async def clear_conversation():
     """Clear the conversation history."""
     try:
-        message_store = get_or_create_session()
+        message_store = await get_or_create_session()
         message_store.clear()
+        await save_session(message_store)
         
         return jsonify({
             'success': True,
@@ -233,20 +368,14 @@ def clear_conversation():
 
 
 @app.route('/api/history', methods=['GET'])
-def get_history():
+async def get_history():
     """Get the conversation history."""
     try:
-        message_store = get_or_create_session()
-        messages = message_store.get_messages()
-        
-        # Filter out system messages for display
-        display_messages = [
-            msg for msg in messages if msg['role'] != 'system'
-        ]
+        message_store = await get_or_create_session()
         
         return jsonify({
             'success': True,
-            'messages': display_messages,
+            'messages': message_store.get_display_messages(),
             'count': message_store.get_conversation_count()
         })
     
@@ -258,110 +387,304 @@ def get_history():
         }), 500
 
 
+def add_file_context(message_store, filename, success, content):
+    """Add extracted file content to the conversation as a system message."""
+    if not (success and content):
+        return
+    
+    # add_system_message truncates the message to fit the context
+    message_store.add_system_message(f"Content of the uploaded file '{filename}':\n\n{content}")
+
+
+class HashingFileTarget(FileTarget):
+    """
+    FileTarget that computes a SHA-256 digest of the data while writing it.
+    
+    FileTarget reopens its file for every part it receives, so only a single
+    part is accepted; the digest then always covers exactly the bytes on disk.
+    """
+    
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self._part_started = False
+    
+    def on_start(self):
+        if self._part_started:
+            raise ValueError("Only one file part is allowed per upload")
+        self._part_started = True
+        self.sha256 = hashlib.sha256()
+        super().on_start()
+    
+    def on_data_received(self, chunk):
+        self.sha256.update(chunk)
+        super().on_data_received(chunk)
+
+
+async def receive_upload(temp_path):
+    """
+    Stream a multipart upload straight to disk without buffering the body in memory.
+    
+    Args:
+        temp_path: Path the uploaded file part is written to
+    
+    Returns:
+        Tuple of (filename, digest) with the client-supplied filename of the file part
+        (None if there was no file part) and the hex SHA-256 digest of its content
+    
+    Raises:
+        RequestEntityTooLarge: If the body exceeds MAX_CONTENT_LENGTH, whether or not
+            the client declared its length
+        ParseFailedException: If the body is not valid multipart form data
+    """
+    parser = StreamingFormDataParser(headers={'Content-Type': request.headers.get('Content-Type', '')})
+    file_target = HashingFileTarget(temp_path)
+    parser.register('file', file_target)
+    
+    # Count the bytes ourselves: chunked bodies carry no Content-Length to check up front
+    max_length = app.config['MAX_CONTENT_LENGTH']
+    received = 0
+    async for chunk in request.body:
+        received += len(chunk)
+        if received > max_length:
+            raise RequestEntityTooLarge()
+        parser.data_received(chunk)
+    
+    return file_target.multipart_filename, file_target.sha256.hexdigest()
+
+
 @app.route('/api/upload', methods=['POST'])
-def upload_file():
+async def upload_file():
     """Handle file uploads."""
+    from modules.file_parser import get_file_summary, extract_text_cached, PARSED_FILE_TYPES, EXTRACTED_SUFFIX
+    
+    temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f".{uuid.uuid4().hex}.part")
+    
     try:
         # Check if the post request has the file part
-        if 'file' not in request.files:
+        original_filename = None
+        if request.mimetype == 'multipart/form-data':
+            try:
+                original_filename, digest = await receive_upload(temp_path)
+            except (ValueError, ParseFailedException) as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        
+        if original_filename is None:
             return jsonify({
                 'success': False,
                 'error': 'No file part'
             }), 400
         
-        file = request.files['file']
-        message = request.form.get('message', '')
-        
         # If user does not select file, browser also
         # submit an empty part without filename
-        if file.filename == '':
+        if original_filename == '':
             return jsonify({
                 'success': False,
                 'error': 'No selected file'
             }), 400
         
-        if file and allowed_file(file.filename):
-            # Create a unique filename to prevent collisions
-            filename = secure_filename(file.filename)
-            unique_filename = f"{int(time.time())}_{filename}"
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            
-            # Save the file
-            file.save(file_path)
-            
-            # Get file summary and extract text if possible
-            file_summary = get_file_summary(file_path)
-            success, content, error = extract_text_from_file(file_path)
+        if allowed_file(original_filename):
+            filename = cached_secure_filename(original_filename)
             
             # Get file extension
             file_extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
             
+            # Store files by content so identical uploads share one copy,
+            # along with its cached summary and extracted text
+            unique_filename = f"{digest}.{file_extension}" if file_extension else digest
+            file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+            
+            # Move the streamed file into place unless the content is already stored
+            if not os.path.exists(file_path):
+                os.replace(temp_path, file_path)
+            
+            # Get file summary
+            file_summary = await asyncio.to_thread(get_file_summary, file_path)
+            if 'type' not in file_summary:
+                return jsonify({
+                    'success': False,
+                    'error': file_summary['error']
+                }), 500
+            
             # Get session and add file info to message history
-            message_store = get_or_create_session()
+            message_store = await get_or_create_session()
             
             # Create a detailed file info message
             file_info = f"[Uploaded file: {filename} ({file_extension.upper()}, {file_summary['size_formatted']})]"
             message_store.add_message("user", file_info)
             
-            # Add file content as system message if available
-            if success and content:
-                # Limit content to 4000 characters to avoid context length issues
-                if len(content) > 4000:
-                    content = content[:4000] + "... [content truncated]"
-                
-                file_content_msg = {
-                    "role": "system",
-                    "content": f"Content of the uploaded file '{filename}':\n\n{content}"
-                }
-                message_store.add_system_message(file_content_msg["content"])
-            
-            # Return success with file info
-            return jsonify({
+            result = {
                 'success': True,
                 'filename': filename,
                 'unique_filename': unique_filename,
                 'file_path': f"/uploads/{unique_filename}",
                 'file_size': file_summary['size'],
                 'file_type': file_extension,
-                'content_extracted': success,
+                'content_extracted': False,
                 'content_preview': file_summary.get('content_preview', '')[:100] + '...' if file_summary.get('content_preview') else ''
-            })
+            }
+            
+            # Extract text, reading only as much as the conversation context will keep.
+            # Documents that have to be parsed go to the worker queue when one is
+            # configured, so parsing never holds up the request; everything else,
+            # including a duplicate upload whose text is already cached, is a
+            # bounded read and is extracted inline.
+            needs_parsing = (file_summary['type'] in PARSED_FILE_TYPES
+                             and not os.path.exists(file_path + EXTRACTED_SUFFIX))
+            if extract_queue is not None and needs_parsing:
+                job = await asyncio.to_thread(
+                    extract_queue.enqueue,
+                    extract_text_cached, file_path, FILE_CONTEXT_CHARS + 1, file_summary['type'],
+                    meta={'session_id': session['session_id'], 'filename': filename}
+                )
+                result['job_id'] = job.id
+            else:
+                success, content, error = await asyncio.to_thread(
+                    extract_text_cached, file_path, FILE_CONTEXT_CHARS + 1, file_summary['type']
+                )
+                add_file_context(message_store, filename, success, content)
+                result['content_extracted'] = success
+            
+            await save_session(message_store)
+            
+            # Return success with file info
+            return jsonify(result)
         else:
             return jsonify({
                 'success': False,
                 'error': f'File type not allowed. Allowed types: {", ".join(ALLOWED_EXTENSIONS)}'
             }), 400
     
+    except HTTPException:
+        # Let Quart answer with the proper status, e.g. 413 for an oversized body
+        raise
+    
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
+    
+    finally:
+        # Remove the partial file if the upload was rejected or failed
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+async def apply_extract_result(job, success, content):
+    """Add a finished extraction to the uploader's conversation exactly once."""
+    if job.meta.get('session_id') == session.get('session_id') and not job.meta.get('applied'):
+        message_store = await get_or_create_session()
+        add_file_context(message_store, job.meta['filename'], success, content)
+        await save_session(message_store)
+        job.meta['applied'] = True
+        await asyncio.to_thread(job.save_meta)
+
+
+@app.route('/api/file-extract-status/<job_id>')
+async def get_file_extract_status(job_id):
+    """
+    Report the state of a background text extraction started by an upload.
+    
+    With ?fallback=1 a job that no worker has started yet is cancelled and
+    extracted in this request instead, so uploads complete without a worker.
+    """
+    if extract_queue is None:
+        return jsonify({
+            'success': False,
+            'error': 'Background extraction is not enabled'
+        }), 404
+    
+    try:
+        from rq.exceptions import NoSuchJobError
+        from rq.job import Job, JobStatus
+        
+        try:
+            job = await asyncio.to_thread(Job.fetch, job_id, connection=extract_queue.connection)
+        except NoSuchJobError:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+        
+        status = await asyncio.to_thread(job.get_status)
+        
+        if status == JobStatus.FINISHED:
+            success, content, error = await asyncio.to_thread(job.return_value)
+            await apply_extract_result(job, success, content)
+            return jsonify({
+                'success': True,
+                'status': status.value,
+                'content_extracted': success,
+                'error': error
+            })
+        
+        if request.args.get('fallback') == '1':
+            if status in (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED):
+                # No worker picked the job up in time; extract the file here instead
+                await asyncio.to_thread(job.cancel)
+                success, content, error = await asyncio.to_thread(job.func, *job.args, **job.kwargs)
+                await apply_extract_result(job, success, content)
+                return jsonify({
+                    'success': True,
+                    'status': JobStatus.FINISHED.value,
+                    'content_extracted': success,
+                    'error': error
+                })
+            
+            return jsonify({
+                'success': True,
+                'status': status.value,
+                'content_extracted': False,
+                'error': 'Text extraction did not finish in time'
+            })
+        
+        return jsonify({
+            'success': True,
+            'status': status.value,
+            'content_extracted': False
+        })
+    
+    except Exception as e:
+        logger.error(f"Error getting extraction status: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
 
 
 @app.route('/uploads/<filename>')
-def uploaded_file(filename):
+async def uploaded_file(filename):
     """Serve uploaded files."""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    return await send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
 @app.route('/api/file-content/<filename>')
-def get_file_content(filename):
+async def get_file_content(filename):
     """Get the content of an uploaded file."""
+    from modules.file_parser import get_file_summary, extract_text_cached
+    
     try:
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         
-        # Check if file exists
-        if not os.path.exists(file_path):
+        # Check if file exists, keeping the stat result for the summary
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
             return jsonify({
                 'success': False,
                 'error': 'File not found'
             }), 404
         
-        # Get file summary and extract text
-        file_summary = get_file_summary(file_path)
-        success, content, error = extract_text_from_file(file_path)
+        # Get file summary and extract text off the event loop
+        file_summary = await asyncio.to_thread(get_file_summary, file_path, st)
+        success, content, error = await asyncio.to_thread(
+            extract_text_cached, file_path, None, file_summary.get('type')
+        )
         
         if success:
             return jsonify({
@@ -387,19 +710,9 @@ def get_file_content(filename):
 
 
 @app.route('/health')
-def health():
+async def health():
     """Health check endpoint."""
-    available_providers = []
-    if Config.OPENAI_API_KEY:
-        available_providers.append(f"openai ({Config.OPENAI_MODEL})")
-    if Config.GROQ_API_KEY:
-        available_providers.append(f"groq ({Config.GROQ_MODEL})")
-    
-    return jsonify({
-        'status': 'healthy',
-        'providers': available_providers,
-        'preference': Config.AI_PROVIDER
-    })
+    return Response(_HEALTH_BODY, mimetype='application/json')
 
 
 if __name__ == '__main__':
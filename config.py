@@ -23,15 +23,21 @@ class Config:
     GROQ_MODEL = os.environ.get('GROQ_MODEL', 'llama-3.3-70b-versatile')
     
     # Provider priority (will try in order)
-    AI_PROVIDER = os.environ.get('AI_PROVIDER', 'auto')  # auto, openai, groq
+    AI_PROVIDER = os.environ.get('AI_PROVIDER', 'auto')  # auto, openai, groq, race
     
     # Chat configuration
     MAX_CONVERSATION_HISTORY = int(os.environ.get('MAX_CONVERSATION_HISTORY', '10'))
+    MAX_CONTEXT_TOKENS = int(os.environ.get('MAX_CONTEXT_TOKENS', '4000'))  # approximate history token budget
     SYSTEM_MESSAGE = os.environ.get(
         'SYSTEM_MESSAGE',
         'You are a helpful, friendly, and knowledgeable AI assistant.'
     )
     
+    # Session storage configuration
+    REDIS_URL = os.environ.get('REDIS_URL')  # e.g. redis://localhost:6379/0
+    SESSION_TTL = int(os.environ.get('SESSION_TTL', '900'))  # idle seconds before a session expires
+    SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+    
     @staticmethod
     def validate():
         """Validate required configuration."""
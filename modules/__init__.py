@@ -1,8 +1,31 @@
 """
 Modules package for the chatbot application.
+
+Public names are imported lazily on first access (PEP 562), so importing
+one of them does not pull in the provider SDKs or file parsers.
 """
-from .chat_handler import ChatHandler
-from .message_store import MessageStore
-from .file_parser import get_file_summary, extract_text_from_file
+import importlib
+
+_LAZY = {
+    'ChatHandler': '.chat_handler',
+    'MessageStore': '.message_store',
+    'SessionStore': '.session_store',
+    'get_file_summary': '.file_parser',
+    'extract_text_from_file': '.file_parser',
+    'extract_text_cached': '.file_parser',
+}
+
+__all__ = ['ChatHandler', 'MessageStore', 'SessionStore', 'get_file_summary', 'extract_text_from_file', 'extract_text_cached']
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        module = importlib.import_module(_LAZY[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = ['ChatHandler', 'MessageStore', 'get_file_summary', 'extract_text_from_file']
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
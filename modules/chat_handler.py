@@ -1,13 +1,19 @@
 """
 Chat handler module for AI API integration with multiple provider support.
 """
-from openai import OpenAI
-from groq import Groq
 from typing import Dict, Optional, List
+import asyncio
 import logging
 
+import httpx
+
 logger = logging.getLogger(__name__)
 
+# Connection pool settings shared by all provider clients
+HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+HTTP_CONNECT_RETRIES = 2
+
 
 class ChatHandler:
     """Handles communication with multiple AI providers (OpenAI, Groq) with automatic fallback."""
@@ -23,17 +29,22 @@ class ChatHandler:
             openai_model: OpenAI model to use
             groq_key: Groq API key
             groq_model: Groq model to use
-            provider: Preferred provider ('auto', 'openai', 'groq')
+            provider: Preferred provider ('auto', 'openai', 'groq', or 'race' to query all at once)
         """
         self.providers = []
         self.provider_preference = provider.lower()
-        self.current_provider = None
-        self.current_model = None
         
-        # Initialize OpenAI if key is provided
+        # One pooled HTTP/2 keep-alive client shared by all providers and requests
+        self.http_client = httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(http2=True, limits=HTTP_LIMITS, retries=HTTP_CONNECT_RETRIES),
+            timeout=HTTP_TIMEOUT
+        )
+        
+        # Initialize OpenAI if key is provided; the SDK is only imported when needed
         if openai_key:
             try:
-                self.openai_client = OpenAI(api_key=openai_key)
+                from openai import AsyncOpenAI
+                self.openai_client = AsyncOpenAI(api_key=openai_key, http_client=self.http_client, timeout=HTTP_TIMEOUT)
                 self.openai_model = openai_model
                 self.providers.append('openai')
                 logger.info("OpenAI provider initialized")
@@ -43,10 +54,11 @@ class ChatHandler:
         else:
             self.openai_client = None
         
-        # Initialize Groq if key is provided
+        # Initialize Groq if key is provided; the SDK is only imported when needed
         if groq_key:
             try:
-                self.groq_client = Groq(api_key=groq_key)
+                from groq import AsyncGroq
+                self.groq_client = AsyncGroq(api_key=groq_key, http_client=self.http_client, timeout=HTTP_TIMEOUT)
                 self.groq_model = groq_model
                 self.providers.append('groq')
                 logger.info("Groq provider initialized")
@@ -71,10 +83,10 @@ class ChatHandler:
             # Auto mode: try Groq first (faster and cheaper), then OpenAI
             return sorted(self.providers, key=lambda x: 0 if x == 'groq' else 1)
     
-    def _try_groq(self, messages: list, temperature: float) -> Dict[str, any]:
+    async def _try_groq(self, messages: list, temperature: float) -> Dict[str, any]:
         """Try to get response from Groq."""
         try:
-            response = self.groq_client.chat.completions.create(
+            response = await self.groq_client.chat.completions.create(
                 model=self.groq_model,
                 messages=messages,
                 temperature=temperature,
@@ -98,10 +110,10 @@ class ChatHandler:
             logger.warning(f"Groq API error: {str(e)}")
             raise
     
-    def _try_openai(self, messages: list, temperature: float) -> Dict[str, any]:
+    async def _try_openai(self, messages: list, temperature: float) -> Dict[str, any]:
         """Try to get response from OpenAI."""
         try:
-            response = self.openai_client.chat.completions.create(
+            response = await self.openai_client.chat.completions.create(
                 model=self.openai_model,
                 messages=messages,
                 temperature=temperature,
@@ -125,7 +137,7 @@ class ChatHandler:
             logger.warning(f"OpenAI API error: {str(e)}")
             raise
     
-    def get_response(self, messages: list, temperature: float = 0.7) -> Dict[str, any]:
+    async def get_response(self, messages: list, temperature: float = 0.7) -> Dict[str, any]:
         """
         Get a response from available AI providers with automatic fallback.
         
@@ -136,6 +148,9 @@ class ChatHandler:
         Returns:
             Dictionary containing response or error information
         """
+        if self.provider_preference == 'race' and len(self.providers) > 1:
+            return await self.get_response_race(messages, temperature)
+        
         provider_order = self._get_provider_order()
         errors = []
         
@@ -143,10 +158,10 @@ class ChatHandler:
             try:
                 if provider == 'groq' and self.groq_client:
                     logger.info(f"Trying Groq API with model {self.groq_model}")
-                    return self._try_groq(messages, temperature)
+                    return await self._try_groq(messages, temperature)
                 elif provider == 'openai' and self.openai_client:
                     logger.info(f"Trying OpenAI API with model {self.openai_model}")
-                    return self._try_openai(messages, temperature)
+                    return await self._try_openai(messages, temperature)
             except Exception as e:
                 error_msg = f"{provider}: {str(e)}"
                 errors.append(error_msg)
@@ -161,13 +176,65 @@ class ChatHandler:
             "message": "Sorry, all AI services are currently unavailable. Please try again later."
         }
     
-    def stream_response(self, messages: list, temperature: float = 0.7):
+    async def get_response_race(self, messages: list, temperature: float = 0.7) -> Dict[str, any]:
+        """
+        Query all available providers concurrently and return the first successful response.
+        
+        The remaining requests are cancelled as soon as one provider succeeds.
+        
+        Args:
+            messages: List of message dictionaries
+            temperature: Sampling temperature (0-2)
+        
+        Returns:
+            Dictionary containing response or error information
+        """
+        tasks = {}
+        if self.groq_client:
+            tasks[asyncio.create_task(self._try_groq(messages, temperature))] = 'groq'
+        if self.openai_client:
+            tasks[asyncio.create_task(self._try_openai(messages, temperature))] = 'openai'
+        
+        logger.info(f"Racing providers: {', '.join(tasks.values())}")
+        pending = set(tasks)
+        errors = []
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{tasks[task]}: {str(task.exception())}")
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        # All providers failed
+        logger.error(f"All providers failed. Errors: {errors}")
+        return {
+            "success": False,
+            "error": " | ".join(errors),
+            "message": "Sorry, all AI services are currently unavailable. Please try again later."
+        }
+    
+    async def aclose(self):
+        """Close the shared HTTP client."""
+        await self.http_client.aclose()
+    
+    async def stream_response(self, messages: list, temperature: float = 0.7,
+                              stream_info: Optional[Dict[str, str]] = None):
         """
         Stream a response from available AI providers with automatic fallback.
         
+        The handler is shared by concurrent streams, so the provider and model
+        that served this stream are reported through stream_info.
+        
         Args:
             messages: List of message dictionaries
             temperature: Sampling temperature (0-2)
+            stream_info: Dictionary whose 'provider' and 'model' keys are set
+                for this stream ('error' and 'none' if all providers failed)
         
         Yields:
             Response chunks
@@ -178,10 +245,10 @@ class ChatHandler:
             try:
                 if provider == 'groq' and self.groq_client:
                     logger.info(f"Streaming from Groq with model {self.groq_model}")
-                    self.current_provider = 'groq'
-                    self.current_model = self.groq_model
+                    if stream_info is not None:
+                        stream_info.update(provider='groq', model=self.groq_model)
                     
-                    stream = self.groq_client.chat.completions.create(
+                    stream = await self.groq_client.chat.completions.create(
                         model=self.groq_model,
                         messages=messages,
                         temperature=temperature,
@@ -189,17 +256,17 @@ class ChatHandler:
                         stream=True
                     )
                     
-                    for chunk in stream:
+                    async for chunk in stream:
                         if chunk.choices[0].delta.content is not None:
                             yield chunk.choices[0].delta.content
                     return
                     
                 elif provider == 'openai' and self.openai_client:
                     logger.info(f"Streaming from OpenAI with model {self.openai_model}")
-                    self.current_provider = 'openai'
-                    self.current_model = self.openai_model
+                    if stream_info is not None:
+                        stream_info.update(provider='openai', model=self.openai_model)
                     
-                    stream = self.openai_client.chat.completions.create(
+                    stream = await self.openai_client.chat.completions.create(
                         model=self.openai_model,
                         messages=messages,
                         temperature=temperature,
@@ -207,18 +274,16 @@ class ChatHandler:
                         stream=True
                     )
                     
-                    for chunk in stream:
+                    async for chunk in stream:
                         if chunk.choices[0].delta.content is not None:
                             yield chunk.choices[0].delta.content
                     return
                     
             except Exception as e:
                 logger.error(f"Error streaming from {provider}: {str(e)}")
-                self.current_provider = None
-                self.current_model = None
                 continue
         
         # All providers failed
-        self.current_provider = 'error'
-        self.current_model = 'none'
+        if stream_info is not None:
+            stream_info.update(provider='error', model='none')
         yield "Error: All AI services are currently unavailable."
\ No newline at end of file
@@ -3,152 +3,456 @@ File parsing utilities for the chatbot.
 Extracts text content from various file types.
 """
 import os
+import importlib
 import logging
 import mimetypes
-from pathlib import Path
+import mmap
+import threading
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
 # Maximum file size for text extraction (5MB)
 MAX_TEXT_SIZE = 5 * 1024 * 1024
 
-def get_file_type(file_path):
+# Number of characters in a file summary's content preview, and the bytes read
+# to build it: enough for one character more even in 4-byte UTF-8, so reading
+# more than PREVIEW_CHARS characters is what marks the preview as truncated
+PREVIEW_CHARS = 1000
+PREVIEW_BYTES = (PREVIEW_CHARS + 1) * 4
+
+# Maximum number of file summaries kept by get_file_summary
+SUMMARY_CACHE_SIZE = 256
+
+# real path -> (mtime_ns, size, summary) for the last summarized version of each file
+_SUMMARY_CACHE = {}
+_SUMMARY_CACHE_LOCK = threading.Lock()
+
+# Files larger than this are decoded from a memory map instead of a read buffer
+MMAP_MIN_SIZE = 64 * 1024
+
+# Suffix of the sidecar file holding text extracted from a parsed document
+EXTRACTED_SUFFIX = '.extracted.txt'
+
+# File types whose text has to be parsed out of the document
+PARSED_FILE_TYPES = {'pdf', 'document', 'spreadsheet'}
+
+# File type for each known extension
+_EXT_TO_TYPE = {
+    **dict.fromkeys(['.txt', '.md', '.csv', '.json', '.xml', '.html', '.htm', '.js', '.py', '.java', '.c', '.cpp', '.h', '.css', '.yml', '.yaml'], 'text'),
+    '.pdf': 'pdf',
+    **dict.fromkeys(['.png', '.jpg', '.jpeg', '.gif'], 'image'),
+    **dict.fromkeys(['.docx', '.doc'], 'document'),
+    **dict.fromkeys(['.xlsx', '.xls'], 'spreadsheet'),
+    **dict.fromkeys(['.pptx', '.ppt'], 'presentation'),
+    **dict.fromkeys(['.zip', '.tar', '.gz'], 'archive'),
+}
+
+def _fast_suffix(file_path):
+    """Get the lowercased extension of a path string, like Path(file_path).suffix.lower()."""
+    dot = file_path.rfind('.')
+    # The dot must be inside the file name, not its first or last character
+    name_start = max(file_path.rfind('/'), file_path.rfind(os.sep)) + 1
+    if dot <= name_start or dot == len(file_path) - 1:
+        return ''
+    return file_path[dot:].lower()
+
+def _classify(suffix):
+    """Map a lowercased file extension to its file type."""
+    return _EXT_TO_TYPE.get(suffix, 'unknown')
+
+@lru_cache(maxsize=1024)
+def _guess_mime(suffix):
+    """Guess the MIME type for a lowercased file extension."""
+    mime_type, _ = mimetypes.guess_type('file' + suffix)
+    return mime_type
+
+# File type for MIME types reported by content sniffing
+_MIME_TO_TYPE = {
+    'application/json': 'text',
+    'application/xml': 'text',
+    'application/pdf': 'pdf',
+    'application/msword': 'document',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'document',
+    'application/vnd.ms-excel': 'spreadsheet',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'spreadsheet',
+    'application/vnd.ms-powerpoint': 'presentation',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'presentation',
+    'application/zip': 'archive',
+    'application/x-tar': 'archive',
+    'application/gzip': 'archive',
+}
+
+@lru_cache(maxsize=1024)
+def _sniff_mime(file_path, mtime_ns, file_size):
+    """Detect a file's MIME type from its content with libmagic; size and mtime key the cache."""
+    # python-magic is optional; without it files are only classified by extension
+    magic = _optional_module('magic')
+    if magic is None:
+        return None
+    try:
+        return magic.from_file(file_path, mime=True)
+    except Exception as e:
+        logger.warning("Content type detection failed for %s: %s", file_path, e)
+        return None
+
+def _sniffed_mime(file_path, st=None):
+    """Get the content-sniffed MIME type of a file, or None if it cannot be determined."""
+    try:
+        if st is None:
+            st = os.stat(file_path)
+    except OSError:
+        return None
+    return _sniff_mime(os.path.realpath(file_path), st.st_mtime_ns, st.st_size)
+
+def get_file_kind(file_path, detect_content=True, st=None):
+    """
+    Determine the file type based on extension and content, without the MIME type.
+    
+    The extension is checked first; the content is only inspected for
+    unknown extensions, and each file version is sniffed at most once.
+    
+    Args:
+        file_path: Path to the file
+        detect_content: Sniff the content of files with an unknown extension
+        st: Result of os.stat(file_path) if the caller already has it
+        
+    Returns:
+        File type, e.g. 'text', 'pdf' or 'unknown'
+    """
+    file_type = _classify(_fast_suffix(file_path))
+    if file_type != 'unknown' or not detect_content:
+        return file_type
+    
+    mime_type = _sniffed_mime(file_path, st)
+    if mime_type is None:
+        return 'unknown'
+    
+    file_type = _MIME_TO_TYPE.get(mime_type)
+    if file_type is None:
+        major = mime_type.split('/', 1)[0]
+        file_type = major if major in ('text', 'image') else 'unknown'
+    return file_type
+
+def get_mime(file_path, detect_content=True, st=None):
+    """
+    Determine the MIME type of a file from its extension, or its content for unknown extensions.
+    
+    Args:
+        file_path: Path to the file
+        detect_content: Sniff the content of files with an unknown extension
+        st: Result of os.stat(file_path) if the caller already has it
+        
+    Returns:
+        MIME type, or None if it cannot be determined
+    """
+    file_ext = _fast_suffix(file_path)
+    if detect_content and _classify(file_ext) == 'unknown':
+        mime_type = _sniffed_mime(file_path, st)
+        if mime_type is not None:
+            return mime_type
+    return _guess_mime(file_ext)
+
+def get_file_type(file_path, detect_content=True):
     """
     Determine the file type based on extension and content.
     
+    Callers that need only one of the two should use get_file_kind or get_mime.
+    
     Args:
         file_path: Path to the file
+        detect_content: Sniff the content of files with an unknown extension
         
     Returns:
         Tuple of (file_type, mime_type)
     """
-    file_ext = Path(file_path).suffix.lower()
-    mime_type, _ = mimetypes.guess_type(file_path)
-    
-    # Default file type based on extension
-    if file_ext in ['.txt', '.md', '.csv', '.json', '.xml', '.html', '.htm', '.js', '.py', '.java', '.c', '.cpp', '.h', '.css', '.yml', '.yaml']:
-        return 'text', mime_type
-    elif file_ext in ['.pdf']:
-        return 'pdf', mime_type
-    elif file_ext in ['.png', '.jpg', '.jpeg', '.gif']:
-        return 'image', mime_type
-    elif file_ext in ['.docx', '.doc']:
-        return 'document', mime_type
-    elif file_ext in ['.xlsx', '.xls']:
-        return 'spreadsheet', mime_type
-    elif file_ext in ['.pptx', '.ppt']:
-        return 'presentation', mime_type
-    elif file_ext in ['.zip', '.tar', '.gz']:
-        return 'archive', mime_type
-    else:
-        return 'unknown', mime_type
-
-def extract_text_from_file(file_path):
+    return get_file_kind(file_path, detect_content), get_mime(file_path, detect_content)
+
+def _probe(file_path, st=None, file_type=None):
+    """
+    Stat and classify a file once so the result can be shared by later steps.
+    
+    Args:
+        file_path: Path to the file
+        st: Result of os.stat(file_path) if the caller already has it
+        file_type: File type if the caller already resolved it
+        
+    Returns:
+        Tuple of (stat_result, file_type)
+    """
+    if st is None:
+        st = os.stat(file_path)
+    if file_type is None:
+        file_type = get_file_kind(file_path, st=st)
+    return st, file_type
+
+def _extraction_error(file_path, e):
+    """Log an extraction failure and build the matching result tuple."""
+    logger.error("Error extracting text from file %s: %s", file_path, e)
+    return False, "", f"Error extracting text: {str(e)}"
+
+def extract_text_from_file(file_path, max_chars=None, file_type=None):
     """
     Extract text content from a file based on its type.
     
     Args:
         file_path: Path to the file
+        max_chars: Maximum number of characters to read from text files (default: all)
+        file_type: File type if already known (e.g. from get_file_summary), to skip classifying again
         
     Returns:
         Tuple of (success, content, error_message)
     """
+    try:
+        st, file_type = _probe(file_path, file_type=file_type)
+    except Exception as e:
+        return _extraction_error(file_path, e)
+    return _extract_text(file_path, st.st_size, file_type, max_chars)
+
+def _extract_text(file_path, file_size, file_type, max_chars=None):
+    """Extract text from a file whose size and type are already known."""
     try:
         # Check file size
-        file_size = os.path.getsize(file_path)
         if file_size > MAX_TEXT_SIZE:
             return False, "", f"File too large for text extraction ({file_size / 1024 / 1024:.1f} MB)"
         
-        file_type, mime_type = get_file_type(file_path)
-        
         # Handle different file types
-        if file_type == 'text':
-            return extract_from_text_file(file_path)
-        elif file_type == 'pdf':
-            return extract_from_pdf(file_path)
-        elif file_type == 'document':
-            return extract_from_docx(file_path)
-        elif file_type == 'spreadsheet':
-            return extract_from_xlsx(file_path)
-        elif file_type == 'image':
-            # For images, we just return a placeholder
-            return True, "[Image file - content cannot be displayed as text]", ""
-        else:
+        extractor = _EXTRACTORS.get(file_type)
+        if extractor is None:
             return False, "", f"Text extraction not supported for this file type: {file_type}"
+        return extractor(file_path, max_chars, file_size)
             
     except Exception as e:
-        logger.error(f"Error extracting text from file {file_path}: {str(e)}")
-        return False, "", f"Error extracting text: {str(e)}"
+        return _extraction_error(file_path, e)
 
-def extract_from_text_file(file_path):
-    """Extract text from plain text files."""
+def extract_from_text_file(file_path, max_chars=None, preview_only=False, *, known_size=None):
+    """
+    Extract text from plain text files, reading at most max_chars characters if given.
+    With preview_only, only the first PREVIEW_BYTES bytes are read. known_size is
+    the file size if the caller already stat'ed it, used to size the read buffer.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return True, content, ""
-    except UnicodeDecodeError:
-        # Try with a different encoding
-        try:
-            with open(file_path, 'r', encoding='latin-1') as f:
-                content = f.read()
-            return True, content, ""
-        except Exception as e:
-            return False, "", f"Error reading text file: {str(e)}"
+        # Read the bytes once and decode in memory; a UTF-8 character is at most 4 bytes
+        if preview_only:
+            limit = PREVIEW_BYTES
+        elif max_chars is None:
+            limit = MAX_TEXT_SIZE + 1
+        else:
+            limit = max_chars * 4
+        if known_size is not None:
+            # One byte past the end still detects a file that grew since it was stat'ed
+            limit = min(limit, known_size + 1)
+        
+        with open(file_path, 'rb') as f:
+            if limit <= MMAP_MIN_SIZE:
+                content = _decode_text(f.read(limit), limit)
+            else:
+                file_size = known_size if known_size is not None else os.fstat(f.fileno()).st_size
+                if file_size <= MMAP_MIN_SIZE:
+                    content = _decode_text(f.read(limit), limit)
+                else:
+                    # Decode straight from the page cache instead of copying the file into a bytes object
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                        with view[:limit] as raw:
+                            content = _decode_text(raw, limit)
+        
+        if content is None:
+            return False, "", f"File too large for text extraction ({limit / 1024 / 1024:.1f} MB)"
+        return True, content[:max_chars], ""
     except Exception as e:
         return False, "", f"Error reading text file: {str(e)}"
 
+def _decode_text(raw, limit):
+    """
+    Decode bytes read with the given limit as UTF-8, falling back to latin-1.
+    
+    Returns:
+        The decoded text, or None if a full read was cut off at MAX_TEXT_SIZE
+    """
+    if limit > MAX_TEXT_SIZE and len(raw) > MAX_TEXT_SIZE:
+        return None
+    try:
+        return str(raw, 'utf-8')
+    except UnicodeDecodeError as e:
+        if len(raw) == limit and e.reason == 'unexpected end of data':
+            # The read limit split a multi-byte character
+            return str(raw[:e.start], 'utf-8')
+        # Fall back to latin-1, which can decode any byte sequence
+        return str(raw, 'latin-1')
+
+@lru_cache(maxsize=None)
+def _optional_module(name):
+    """Import an optional parser library on first use, or return None if it is not installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
 def extract_from_pdf(file_path):
     """Extract text from PDF files."""
     try:
-        # This requires PyPDF2 or a similar library
-        # For now, return a message about installation
-        return False, "", "PDF text extraction requires additional libraries. Install PyPDF2 with: pip install PyPDF2"
+        # PyPDF2 is optional and only imported when a PDF is parsed
+        PyPDF2 = _optional_module('PyPDF2')
+        if PyPDF2 is None:
+            return False, "", "PDF text extraction requires additional libraries. Install PyPDF2 with: pip install PyPDF2"
+        reader = PyPDF2.PdfReader(file_path)
+        return True, "\n".join(page.extract_text() or "" for page in reader.pages), ""
     except Exception as e:
         return False, "", f"Error extracting text from PDF: {str(e)}"
 
 def extract_from_docx(file_path):
     """Extract text from DOCX files."""
     try:
-        # This requires python-docx
-        # For now, return a message about installation
-        return False, "", "DOCX text extraction requires additional libraries. Install python-docx with: pip install python-docx"
+        # python-docx is optional and only imported when a document is parsed
+        docx = _optional_module('docx')
+        if docx is None:
+            return False, "", "DOCX text extraction requires additional libraries. Install python-docx with: pip install python-docx"
+        document = docx.Document(file_path)
+        return True, "\n".join(paragraph.text for paragraph in document.paragraphs), ""
     except Exception as e:
         return False, "", f"Error extracting text from DOCX: {str(e)}"
 
 def extract_from_xlsx(file_path):
     """Extract text from XLSX files."""
     try:
-        # This requires openpyxl or pandas
-        # For now, return a message about installation
-        return False, "", "XLSX text extraction requires additional libraries. Install openpyxl with: pip install openpyxl"
+        # openpyxl is optional and only imported when a spreadsheet is parsed
+        openpyxl = _optional_module('openpyxl')
+        if openpyxl is None:
+            return False, "", "XLSX text extraction requires additional libraries. Install openpyxl with: pip install openpyxl"
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            lines = []
+            for sheet in workbook.worksheets:
+                lines.append(f"[{sheet.title}]")
+                for row in sheet.iter_rows(values_only=True):
+                    lines.append("\t".join("" if cell is None else str(cell) for cell in row))
+        finally:
+            workbook.close()
+        return True, "\n".join(lines), ""
     except Exception as e:
         return False, "", f"Error extracting text from XLSX: {str(e)}"
 
-def get_file_summary(file_path):
+# Extractor for each file type, called as extractor(file_path, max_chars, file_size)
+_EXTRACTORS = {
+    'text': lambda file_path, max_chars, file_size: extract_from_text_file(file_path, max_chars, known_size=file_size),
+    'pdf': lambda file_path, max_chars, file_size: extract_from_pdf(file_path),
+    'document': lambda file_path, max_chars, file_size: extract_from_docx(file_path),
+    'spreadsheet': lambda file_path, max_chars, file_size: extract_from_xlsx(file_path),
+    # For images, we just return a placeholder
+    'image': lambda file_path, max_chars, file_size: (True, "[Image file - content cannot be displayed as text]", ""),
+}
+
+def extract_text_cached(file_path, max_chars=None, file_type=None):
+    """
+    Extract text like extract_text_from_file, reusing previously extracted text.
+    
+    Text parsed out of documents is written to a sidecar file next to the
+    upload the first time, so later requests read it back instead of parsing
+    the document again. Uploaded files are never modified in place, so the
+    sidecar stays valid for the lifetime of the file. Plain text files are
+    already their own cache and are read directly.
+    
+    Args:
+        file_path: Path to the file
+        max_chars: Maximum number of characters to return (default: all)
+        file_type: File type if already known (e.g. from get_file_summary), to skip classifying again
+        
+    Returns:
+        Tuple of (success, content, error_message)
+    """
+    sidecar_path = file_path + EXTRACTED_SUFFIX
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            return True, f.read(max_chars), ""
+    except FileNotFoundError:
+        pass
+    
+    try:
+        st, file_type = _probe(file_path, file_type=file_type)
+    except Exception as e:
+        return _extraction_error(file_path, e)
+    
+    if file_type not in PARSED_FILE_TYPES:
+        return _extract_text(file_path, st.st_size, file_type, max_chars)
+    
+    success, content, error = _extract_text(file_path, st.st_size, file_type)
+    if success:
+        try:
+            temp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, sidecar_path)
+        except OSError as e:
+            logger.warning("Could not cache extracted text for %s: %s", file_path, e)
+    
+    if max_chars is not None:
+        content = content[:max_chars]
+    return success, content, error
+
+def get_file_summary(file_path, st=None):
     """
     Get a summary of the file including type, size, and a preview of content if available.
     
+    Summaries are cached by real path and reused while the file's mtime and
+    size are unchanged, so a cache hit costs a single stat. Summaries that
+    carry an error are not cached.
+    
     Args:
         file_path: Path to the file
+        st: Result of os.stat(file_path) if the caller already has it
         
     Returns:
         Dictionary with file information
     """
+    try:
+        if st is None:
+            st = os.stat(file_path)
+        real_path = os.path.realpath(file_path)
+        
+        cached = _SUMMARY_CACHE.get(real_path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            summary = cached[2]
+        else:
+            st, file_type = _probe(file_path, st)
+            mime_type = get_mime(file_path, st=st)
+            summary = _build_file_summary(real_path, st.st_size, file_type, mime_type)
+            # Only keep complete summaries; a failed preview may be transient
+            # and is retried on the next call
+            if 'type' in summary and not summary['error']:
+                with _SUMMARY_CACHE_LOCK:
+                    _SUMMARY_CACHE.pop(real_path, None)
+                    if len(_SUMMARY_CACHE) >= SUMMARY_CACHE_SIZE:
+                        # Evict the oldest entry
+                        del _SUMMARY_CACHE[next(iter(_SUMMARY_CACHE))]
+                    _SUMMARY_CACHE[real_path] = (st.st_mtime_ns, st.st_size, summary)
+    except Exception as e:
+        logger.error("Error getting file summary for %s: %s", file_path, e)
+        return {
+            'name': os.path.basename(file_path),
+            'path': file_path,
+            'error': f"Error analyzing file: {str(e)}"
+        }
+    
+    summary = dict(summary)
+    summary['name'] = os.path.basename(file_path)
+    summary['path'] = file_path
+    return summary
+
+def _build_file_summary(file_path, file_size, file_type, mime_type):
+    """Build the summary for the current version of a file."""
     try:
         file_name = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
-        file_type, mime_type = get_file_type(file_path)
         
         # Get content preview for text files
         content_preview = ""
         error_message = ""
         
         if file_type == 'text':
-            success, content, error = extract_from_text_file(file_path)
+            success, content, error = extract_from_text_file(file_path, preview_only=True, known_size=file_size)
             if success:
-                # Limit preview to first 1000 characters
-                content_preview = content[:1000]
-                if len(content) > 1000:
+                # Limit preview to first PREVIEW_CHARS characters
+                content_preview = content[:PREVIEW_CHARS]
+                if len(content) > PREVIEW_CHARS:
                     content_preview += "... [content truncated]"
             else:
                 error_message = error
@@ -165,7 +469,7 @@ def get_file_summary(file_path):
         }
         
     except Exception as e:
-        logger.error(f"Error getting file summary for {file_path}: {str(e)}")
+        logger.error("Error getting file summary for %s: %s", file_path, e)
         return {
             'name': os.path.basename(file_path),
             'path': file_path,
@@ -1,47 +1,132 @@
 """
 Message store module for managing conversation history.
 """
-from typing import List, Dict
+from typing import Iterator, List, Dict, NamedTuple, Optional, Tuple
 from collections import deque
+from itertools import chain, islice
+import sys
+
+import orjson
+
+# Rough characters-per-token ratio used to estimate prompt size
+CHARS_PER_TOKEN = 4
+
+# Token cap for a single additional system message (e.g. uploaded file content)
+MAX_SYSTEM_MESSAGE_TOKENS = 600
+
+# Appended to additional system messages cut to MAX_SYSTEM_MESSAGE_TOKENS
+TRUNCATION_MARKER = "... [content truncated]"
+
+# Token budget for additional system messages in the history; once exceeded
+# the oldest one is dropped (they do not count against the turn budget)
+MAX_FILE_CONTEXT_TOKENS = 2 * MAX_SYSTEM_MESSAGE_TOKENS
+
+# Number of most recent user/assistant messages never dropped to meet the token budget
+MIN_RECENT_MESSAGES = 2
+
+
+# Interned role names, so every stored message shares the same three strings
+_ROLES = {role: sys.intern(role) for role in ("user", "assistant", "system")}
+
+# Roles of the messages that make up conversation turns
+_TURN_ROLES = ("user", "assistant")
+
+
+def estimate_tokens(content: str) -> int:
+    """Estimate the number of tokens in a piece of text."""
+    return (len(content) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class Message(NamedTuple):
+    """
+    A single history entry, stored compactly instead of as a dictionary.
+    
+    Messages never change once added, so each one keeps its JSON encoding
+    and the store is serialized without re-encoding its history.
+    """
+    role: str
+    content: str
+    encoded: bytes  # the [role, content] JSON array
+    
+    @classmethod
+    def create(cls, role: str, content: str) -> "Message":
+        """Build a message with an interned role and its JSON encoding."""
+        role = _ROLES.get(role, role)
+        return cls(role, content, orjson.dumps((role, content)))
+    
+    def to_dict(self) -> Dict[str, str]:
+        """Convert to the message dictionary format used by the AI APIs."""
+        return {"role": self.role, "content": self.content}
 
 
 class MessageStore:
-    """Manages conversation history with a maximum size limit."""
+    """Manages conversation history with a maximum size and token budget."""
     
-    def __init__(self, max_history: int = 10):
+    def __init__(self, max_history: int = 10, max_tokens: int = 4000):
         """
         Initialize the message store.
         
         Args:
             max_history: Maximum number of message pairs to keep in history
+            max_tokens: Approximate token budget for the user and assistant messages in the history
         """
         self.max_history = max_history
-        self.messages = deque(maxlen=max_history * 2)  # *2 for user + assistant pairs
+        self.max_tokens = max_tokens
+        # History ring buffer: _size messages starting at index _head, oldest first
+        self._capacity = max(max_history * 2, 0)  # *2 for user + assistant pairs; 0 keeps no history
+        self._buf = [None] * self._capacity
+        self._head = 0
+        self._size = 0
+        self._display = deque(maxlen=max_history * 2)  # user/assistant messages only
+        self._tokens = 0  # estimated tokens in the user and assistant messages
+        self._context_tokens = 0  # estimated tokens in additional system messages
+        self._user_count = 0  # user messages in the history
+        self._assistant_count = 0  # assistant messages in the history
+        self._snapshot = None  # cached result of get_messages(), reset on every change
+        self._pending = []  # (method name, args) of changes made since the last save
         self.system_message = None
+        # Revision of the persisted copy this store is based on, kept by SessionStore
+        self.revision = 0
     
     def set_system_message(self, content: str):
         """
-        Set the system message for the conversation.
+        Set the system message for the conversation, replacing any previous one.
+        Setting the current content again keeps the existing dictionary and
+        snapshot; otherwise a new dictionary is built, since snapshots already
+        handed out by get_messages() share the old one.
         
         Args:
             content: System message content
         """
+        if self.system_message is not None and self.system_message["content"] == content:
+            return
         self.system_message = {"role": "system", "content": content}
+        self._snapshot = None
+        self._pending.append(("set_system_message", (content,)))
         
     def add_system_message(self, content: str):
         """
         Add an additional system message to the conversation.
         This is useful for adding context about uploaded files or other information.
+        Content longer than MAX_SYSTEM_MESSAGE_TOKENS is truncated, marker included.
         
         Args:
             content: System message content
         """
+        self._pending.append(("add_system_message", (content,)))
+        max_chars = MAX_SYSTEM_MESSAGE_TOKENS * CHARS_PER_TOKEN
+        if len(content) > max_chars:
+            # The marker counts towards the cap, so a truncated message fits MAX_SYSTEM_MESSAGE_TOKENS
+            content = content[:max_chars - len(TRUNCATION_MARKER)] + TRUNCATION_MARKER
+        
         # Add as a regular message with role "system"
-        self.messages.append({"role": "system", "content": content})
+        self._append(Message.create("system", content))
     
     def add_message(self, role: str, content: str):
         """
         Add a message to the conversation history.
+        A "system" message replaces the system message (see set_system_message)
+        instead of being appended; use add_system_message to append one.
         
         Args:
             role: Message role (user, assistant, or system)
@@ -50,24 +135,234 @@ class MessageStore:
         if role == "system":
             self.set_system_message(content)
         else:
-            self.messages.append({"role": role, "content": content})
+            self._pending.append(("add_message", (role, content)))
+            message = Message.create(role, content)
+            self._append(message)
+            self._display.append(message)
+    
+    def take_pending(self) -> List[Tuple[str, tuple]]:
+        """
+        Get and reset the changes made since this was last called.
+        
+        SessionStore saves them with the store so they can be replayed onto a
+        newer copy if another worker saved the session in the meantime.
+        
+        Returns:
+            List of (method name, args) tuples, oldest first
+        """
+        pending, self._pending = self._pending, []
+        return pending
+    
+    def replay(self, changes: List[Tuple[str, tuple]]):
+        """
+        Apply changes returned by take_pending() from another copy of this store.
+        
+        Args:
+            changes: List of (method name, args) tuples, oldest first
+        """
+        for name, args in changes:
+            getattr(self, name)(*args)
+    
+    def _append(self, message: Message):
+        """
+        Append a message to the history, then enforce the token budgets.
+        
+        Once the user and assistant messages exceed max_tokens, the oldest turn
+        (a user message together with its reply) is dropped, always keeping the
+        most recent turn. Additional system messages are budgeted separately by
+        MAX_FILE_CONTEXT_TOKENS. When the buffer is full the oldest message is
+        overwritten in place, and a reply left without its user message is dropped.
+        
+        Args:
+            message: Message to append
+        """
+        if self._capacity == 0:
+            return
+        tail = (self._head + self._size) % self._capacity
+        if self._size == self._capacity:
+            # The tail slot is the head slot, holding the oldest message
+            self._forget(self._buf[tail])
+            self._head = (self._head + 1) % self._capacity
+        else:
+            self._size += 1
+        self._buf[tail] = message
+        self._count(message, 1)
+        
+        if message.role == "system":
+            while self._context_tokens > MAX_FILE_CONTEXT_TOKENS:
+                self._forget(self._remove(self._find(0, ("system",))))
+        else:
+            while self._tokens > self.max_tokens and self._user_count + self._assistant_count > MIN_RECENT_MESSAGES:
+                self._drop_oldest_turn()
+        
+        # Never start the conversation with a reply to a message that is gone
+        first = self._find(0, _TURN_ROLES)
+        while first is not None and first < self._size - 1 and self._at(first).role == "assistant":
+            self._forget(self._remove(first))
+            first = self._find(first, _TURN_ROLES)
+        
+        self._snapshot = None
+    
+    def _drop_oldest_turn(self):
+        """Drop the oldest user message together with the reply that follows it."""
+        offset = self._find(0, _TURN_ROLES)
+        message = self._remove(offset)
+        self._forget(message)
+        if message.role == "user":
+            # Later messages moved down by one, so the reply is searched from offset
+            reply = self._find(offset, _TURN_ROLES)
+            if reply is not None and self._at(reply).role == "assistant":
+                self._forget(self._remove(reply))
+    
+    def _count(self, message: Message, sign: int):
+        """Add a message to (sign 1) or remove it from (sign -1) the token estimates and role counts."""
+        tokens = sign * estimate_tokens(message.content)
+        if message.role == "system":
+            self._context_tokens += tokens
+        else:
+            self._tokens += tokens
+            if message.role == "user":
+                self._user_count += sign
+            elif message.role == "assistant":
+                self._assistant_count += sign
     
-    def get_messages(self) -> List[Dict[str, str]]:
+    def _forget(self, message: Message):
+        """Remove an evicted message from the token estimates and role counts."""
+        self._count(message, -1)
+    
+    def _at(self, offset: int) -> Message:
+        """Get the message offset positions after the oldest one."""
+        return self._buf[(self._head + offset) % self._capacity]
+    
+    def _find(self, start: int, roles: Tuple[str, ...]) -> Optional[int]:
+        """Get the offset of the first message at or after start with one of the roles, or None."""
+        for offset in range(start, self._size):
+            if self._at(offset).role in roles:
+                return offset
+        return None
+    
+    def _remove(self, offset: int) -> Message:
+        """
+        Remove and return the message at an offset from the oldest one.
+        Older messages shift up by one slot, so later offsets decrease by one.
+        """
+        message = self._at(offset)
+        for i in range(offset, 0, -1):
+            self._buf[(self._head + i) % self._capacity] = self._at(i - 1)
+        self._buf[self._head] = None
+        self._head = (self._head + 1) % self._capacity
+        self._size -= 1
+        return message
+    
+    def _history(self) -> List[Message]:
+        """Get the messages in the history, oldest first."""
+        end = self._head + self._size
+        if end <= self._capacity:
+            return self._buf[self._head:end]
+        return self._buf[self._head:] + self._buf[:end - self._capacity]
+    
+    def _iter_history(self) -> Iterator[Message]:
+        """Iterate over the messages in the history, oldest first, without copying the buffer."""
+        end = self._head + self._size
+        return chain(islice(self._buf, self._head, min(end, self._capacity)),
+                     islice(self._buf, max(end - self._capacity, 0)))
+    
+    def get_messages(self) -> Tuple[Dict[str, str], ...]:
         """
         Get all messages including system message.
         
+        Stored messages are converted to dictionaries here, at the API boundary.
+        The tuple is built once per change to the history and shared between
+        calls, so callers must not modify it or the dictionaries in it.
+        
+        Returns:
+            Tuple of message dictionaries
+        """
+        if self._snapshot is None:
+            if self.system_message:
+                self._snapshot = (self.system_message, *map(Message.to_dict, self._history()))
+            else:
+                self._snapshot = tuple(map(Message.to_dict, self._history()))
+        return self._snapshot
+    
+    def iter_messages(self) -> Iterator[Dict[str, str]]:
+        """
+        Iterate over all messages including system message without building a tuple.
+        
+        The history must not be modified while iterating.
+        
+        Returns:
+            Iterator of message dictionaries
+        """
+        return chain((self.system_message,) if self.system_message else (), map(Message.to_dict, self._iter_history()))
+    
+    def dumps(self) -> bytes:
+        """
+        Serialize the store to JSON for persistence.
+        
+        Only the settings and system message are encoded here; messages are
+        joined from the encoding each one was created with. The user and
+        assistant messages still in the history are always the newest display
+        messages, so only the older display messages are written separately.
+        
+        Returns:
+            UTF-8 encoded JSON document accepted by loads()
+        """
+        head = orjson.dumps({
+            "max_history": self.max_history,
+            "max_tokens": self.max_tokens,
+            "system": self.system_message,
+        })
+        display_only = islice(self._display, max(len(self._display) - self._user_count - self._assistant_count, 0))
+        return b"".join((
+            head[:-1],
+            b',"messages":[', b",".join(message.encoded for message in self._history()),
+            b'],"display_only":[', b",".join(message.encoded for message in display_only),
+            b"]}",
+        ))
+    
+    @classmethod
+    def loads(cls, data: bytes) -> "MessageStore":
+        """
+        Rebuild a store serialized with dumps().
+        
+        Args:
+            data: JSON document produced by dumps()
+            
+        Returns:
+            The restored MessageStore
+        """
+        state = orjson.loads(data)
+        message_store = cls(state["max_history"], state["max_tokens"])
+        message_store.system_message = state["system"]
+        for role, content in state["messages"]:
+            message_store._append(Message.create(role, content))
+        message_store._display.extend(Message.create(role, content) for role, content in state["display_only"])
+        # The display shares the history's message objects rather than holding copies
+        message_store._display.extend(message for message in message_store._history() if message.role != "system")
+        return message_store
+    
+    def get_display_messages(self) -> List[Dict[str, str]]:
+        """
+        Get the user and assistant messages for display, without any system messages.
+        
         Returns:
             List of message dictionaries
         """
-        messages = []
-        if self.system_message:
-            messages.append(self.system_message)
-        messages.extend(list(self.messages))
-        return messages
+        return [message.to_dict() for message in self._display]
     
     def clear(self):
         """Clear all messages except system message."""
-        self.messages.clear()
+        self._pending.append(("clear", ()))
+        self._buf = [None] * self._capacity
+        self._head = 0
+        self._size = 0
+        self._display.clear()
+        self._tokens = 0
+        self._context_tokens = 0
+        self._user_count = 0
+        self._assistant_count = 0
+        self._snapshot = None
     
     def get_conversation_count(self) -> int:
         """
@@ -76,4 +371,4 @@ class MessageStore:
         Returns:
             Number of user-assistant message pairs
         """
-        return len(self.messages) // 2
\ No newline at end of file
+        return min(self._user_count, self._assistant_count)
\ No newline at end of file
@@ -0,0 +1,214 @@
+"""
+Session store module for sharing conversation history across workers.
+"""
+from typing import Callable, Optional
+import asyncio
+import logging
+
+from cachetools import TTLCache
+
+from .message_store import MessageStore
+
+logger = logging.getLogger(__name__)
+
+# Writes a session only if its revision is still the one the caller loaded
+# (or the session no longer exists), returning the new revision or -1
+_SAVE_SCRIPT = """
+local rev = redis.call('HGET', KEYS[1], 'rev')
+if rev and rev ~= ARGV[1] then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'store', ARGV[2])
+local new_rev = redis.call('HINCRBY', KEYS[1], 'rev', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return new_rev
+"""
+
+
+class SessionConflictError(RuntimeError):
+    """Raised when a session keeps being saved by other workers while saving it."""
+
+
+class SessionStore:
+    """Stores conversation sessions in Redis with an idle TTL and a bounded local TTL cache."""
+
+    KEY_PREFIX = "chat:sess:"
+    SAVE_ATTEMPTS = 5
+
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = 900, cache_size: int = 10000):
+        """
+        Initialize the session store.
+
+        Args:
+            redis_url: Redis connection URL. Without it sessions are kept in process memory only.
+            ttl: Idle time in seconds after which a session expires (refreshed on every access)
+            cache_size: Maximum number of sessions kept in the local cache
+        """
+        self.ttl = ttl
+        # session_id -> (revision, MessageStore); entries expire after ttl idle seconds
+        self._cache = TTLCache(maxsize=max(cache_size, 1), ttl=ttl)
+        # Serializes session creation so concurrent requests cannot each create one;
+        # created on first use so it binds to the serving event loop
+        self._create_lock = None
+        self.redis = None
+
+        if redis_url:
+            import redis.asyncio as redis
+            pool = redis.ConnectionPool.from_url(redis_url, decode_responses=False)
+            self.redis = redis.Redis(connection_pool=pool)
+            self._save_script = self.redis.register_script(_SAVE_SCRIPT)
+            logger.info("Redis session store initialized")
+        else:
+            logger.info("REDIS_URL not set, keeping sessions in process memory")
+
+    def _key(self, session_id: str) -> str:
+        """Build the Redis key for a session."""
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def _remember(self, session_id: str, revision: int, message_store: MessageStore):
+        """Put a session into the local cache, evicting the oldest one if full."""
+        self._cache[session_id] = (revision, message_store)
+
+    def _local_fetch(self, session_id: str, revision: Optional[int] = None) -> Optional[MessageStore]:
+        """
+        Look a session up in the local cache.
+
+        Args:
+            session_id: Session identifier
+            revision: Revision the cached copy must match, or None to accept any
+
+        Returns:
+            The cached MessageStore, or None on a miss
+        """
+        cached = self._cache.get(session_id)
+        if cached is None or (revision is not None and cached[0] != revision):
+            return None
+        # Re-inserting restarts the entry's idle timer
+        self._cache[session_id] = cached
+        return cached[1]
+
+    async def get(self, session_id: str) -> Optional[MessageStore]:
+        """
+        Get a session and refresh its idle TTL.
+
+        Only the small revision counter is read when the local copy is current,
+        so hot sessions are not transferred and decoded on every request.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            The session's MessageStore, or None if it does not exist or has expired
+        """
+        if self.redis is None:
+            return self._local_fetch(session_id)
+
+        key = self._key(session_id)
+        pipe = self.redis.pipeline()
+        pipe.hget(key, "rev")
+        pipe.expire(key, self.ttl)
+        revision, _ = await pipe.execute()
+
+        if revision is None:
+            self._cache.pop(session_id, None)
+            return None
+
+        revision = int(revision)
+        message_store = self._local_fetch(session_id, revision)
+        if message_store is not None:
+            return message_store
+
+        data = await self.redis.hget(key, "store")
+        if data is None:
+            return None
+
+        message_store = self._decode(session_id, data, revision)
+        if message_store is not None:
+            self._remember(session_id, revision, message_store)
+        return message_store
+
+    def _decode(self, session_id: str, data: bytes, revision: int) -> Optional[MessageStore]:
+        """Rebuild a stored session, or return None if it cannot be read."""
+        try:
+            message_store = MessageStore.loads(data)
+        except (ValueError, KeyError, TypeError) as e:
+            # Stored in an older or unreadable format; start the session over
+            logger.warning(f"Discarding unreadable session {session_id}: {e}")
+            return None
+        message_store.revision = revision
+        return message_store
+
+    async def get_or_create(self, session_id: str, factory: Callable[[], MessageStore]) -> MessageStore:
+        """
+        Get a session, creating and saving a new one if it does not exist.
+
+        Args:
+            session_id: Session identifier
+            factory: Callable returning a fresh MessageStore
+
+        Returns:
+            The session's MessageStore
+        """
+        message_store = await self.get(session_id)
+        if message_store is not None:
+            return message_store
+
+        if self._create_lock is None:
+            self._create_lock = asyncio.Lock()
+
+        async with self._create_lock:
+            # Another request may have created the session while we waited
+            message_store = await self.get(session_id)
+            if message_store is None:
+                # Another worker may still create it first; save returns whichever copy won
+                message_store = await self.save(session_id, factory())
+            return message_store
+
+    async def save(self, session_id: str, message_store: MessageStore) -> MessageStore:
+        """
+        Persist a session after it has been modified.
+
+        The write only succeeds if no other worker saved the session since this
+        copy was loaded. Otherwise the newer copy is loaded, the changes made to
+        this one are replayed onto it, and the save is retried.
+
+        Args:
+            session_id: Session identifier
+            message_store: The session's MessageStore
+
+        Returns:
+            The MessageStore that was saved: message_store itself, or the newer
+            copy the changes were replayed onto
+
+        Raises:
+            SessionConflictError: If the session was saved by others on every attempt
+        """
+        changes = message_store.take_pending()
+        if self.redis is None:
+            self._remember(session_id, 0, message_store)
+            return message_store
+
+        key = self._key(session_id)
+        for _ in range(self.SAVE_ATTEMPTS):
+            revision = await self._save_script(
+                keys=[key], args=[message_store.revision, message_store.dumps(), self.ttl]
+            )
+            if revision >= 0:
+                message_store.revision = revision
+                self._remember(session_id, revision, message_store)
+                return message_store
+
+            # Another worker saved first: rebase this request's changes onto its copy
+            data, latest_revision = await self.redis.hmget(key, "store", "rev")
+            if data is None or latest_revision is None:
+                continue  # expired meanwhile; the next attempt recreates it
+            latest = self._decode(session_id, data, int(latest_revision))
+            if latest is None:
+                # The stored copy is unreadable, so overwrite it with this one
+                message_store.revision = int(latest_revision)
+                continue
+            latest.replay(changes)
+            latest.take_pending()
+            message_store = latest
+
+        raise SessionConflictError(f"Session {session_id} changed on every save attempt")
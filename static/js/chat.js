@@ -215,6 +215,15 @@ class ChatApp {
             const data = await response.json();
             
             if (data.success) {
+                // Wait for background text extraction so the AI sees the file content
+                if (data.job_id) {
+                    const status = await this.waitForExtraction(data.job_id);
+                    data.content_extracted = status.content_extracted;
+                    if (!status.content_extracted && status.error) {
+                        this.showError(status.error);
+                    }
+                }
+                
                 // Update the last message to show the file was uploaded successfully
                 const lastMessage = this.chatContainer.lastElementChild;
                 const contentDiv = lastMessage.querySelector('.message-content');
@@ -263,7 +272,7 @@ class ChatApp {
                 }
                 
                 // Get AI response
-                await this.streamMessage(`I've uploaded a file named ${this.currentFile.name}. ${message}`);
+                await this.streamMessage(`I've uploaded a file named ${this.currentFile.name}. ${message}`, true);
                 
                 // Close the modal
                 this.closeFilePreviewModal();
@@ -378,7 +387,7 @@ class ChatApp {
         this.setProcessing(false);
     }
     
-    async streamMessage(message) {
+    async streamMessage(message, isFileMessage = false) {
         // Create a placeholder for the bot message
         const messageDiv = this.createBotMessageElement('');
         this.chatContainer.appendChild(messageDiv);
@@ -400,7 +409,8 @@ class ChatApp {
                 body: JSON.stringify({
                     message: message,
                     temperature: 0.7,
-                    stream: true
+                    stream: true,
+                    is_file_message: isFileMessage
                 })
             });
             
@@ -473,6 +483,26 @@ class ChatApp {
         this.scrollToBottom();
     }
     
+    async waitForExtraction(jobId, timeoutMs = 30000) {
+        // Poll until the worker has finished (or given up on) the file
+        const deadline = Date.now() + timeoutMs;
+        while (Date.now() < deadline) {
+            const response = await fetch(`/api/file-extract-status/${jobId}`);
+            const data = await response.json();
+            
+            if (!data.success || data.status === 'finished' || data.status === 'failed' ||
+                data.status === 'stopped' || data.status === 'canceled') {
+                return data;
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, 500));
+        }
+        
+        // No worker finished the job in time; ask the server to extract it directly
+        const response = await fetch(`/api/file-extract-status/${jobId}?fallback=1`);
+        return await response.json();
+    }
+    
     async viewFileContent(filename) {
         try {
             // Show loading indicator